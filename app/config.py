@@ -21,6 +21,16 @@ class Config:
     PORT = int(os.getenv('PORT', 5000))
     DEBUG = os.getenv('DEBUG', 'False') == 'True'
     
+    # ログ設定
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json または text
+    LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 0.1))  # メッセージ本文ログのサンプリング率
+    LOG_REDACT_BODIES = os.getenv('LOG_REDACT_BODIES', 'True') == 'True'
+    LOG_REDACT_KEY = os.getenv('LOG_REDACT_KEY')  # 未設定の場合は本文の長さのみ記録
+    
+    # 顧客リストの1ページあたりの件数
+    CUSTOMER_LIST_PAGE_SIZE = int(os.getenv('CUSTOMER_LIST_PAGE_SIZE', 50))
+    
     @classmethod
     def validate(cls):
         """設定の検証"""
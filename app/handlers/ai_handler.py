@@ -1,6 +1,7 @@
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
 from openai import OpenAI
 from app.config import Config
+from app.utils.aio import resolve
 from typing import List, Dict
 import logging
 import json
@@ -25,7 +26,18 @@ class AIHandler:
             logger.error(f"Failed to initialize AI clients: {e}")
             raise
     
-    def generate_sales_advice(self, appointments_data: List[Dict]) -> str:
+    def use_async_client(self):
+        """Anthropic 呼び出しを非同期クライアントに切り替え（ASGI モード用）"""
+        self.anthropic = AsyncAnthropic(
+            api_key=Config.ANTHROPIC_API_KEY
+        )
+    
+    async def close_async_client(self):
+        """非同期クライアントを閉じる（ASGI モード終了時）"""
+        if isinstance(self.anthropic, AsyncAnthropic):
+            await self.anthropic.close()
+    
+    async def generate_sales_advice(self, appointments_data: List[Dict]) -> str:
         """営業アドバイスを生成（Claude使用）"""
         try:
             if not appointments_data:
@@ -51,12 +63,12 @@ class AIHandler:
 簡潔で実用的なアドバイスを、見やすく絵文字を使って提供してください。
 """
             
-            message = self.anthropic.messages.create(
+            message = await resolve(self.anthropic.messages.create(
                 model="claude-opus-4-20250514",
                 max_tokens=1500,
                 temperature=0,
                 messages=[{"role": "user", "content": prompt}]
-            )
+            ))
             
             response_text = message.content[0].text
             logger.info(f"Sales advice generated successfully")
@@ -66,20 +78,28 @@ class AIHandler:
             logger.error(f"Error generating sales advice: {e}")
             return "申し訳ありません。アドバイス生成中にエラーが発生しました。"
     
-    def format_customer_list(self, customers_data: List[Dict]) -> str:
-        """顧客リストをフォーマット（GPT使用）"""
+    def format_customer_list(self, customers_data: List[Dict], offset: int = 0, has_more: bool = False) -> str:
+        """顧客リストをフォーマット（1ページ分）"""
         try:
             if not customers_data:
                 return "📋 顧客リスト\n\n顧客データが見つかりません。\n\n「記録」から新しい顧客との商談を記録してください。"
             
             # シンプルなフォーマットに変更（API呼び出しを減らすため）
-            result = "📋 顧客リスト\n\n"
+            lines = ["📋 顧客リスト", ""]
             for customer in customers_data:
-                result += f"ID {customer['id']}: {customer['client']}\n"
-            result += f"\n合計: {len(customers_data)}件の顧客"
+                lines.append(f"ID {customer['id']}: {customer['client']}")
+                if customer.get('appointment_count'):
+                    lines.append(f"  最終: {customer.get('last_date', '不明')} / 商談{customer['appointment_count']}回")
+                if customer.get('last_note'):
+                    lines.append(f"  📝 {customer['last_note']}")
+            
+            lines.append("")
+            lines.append(f"{offset + 1}〜{offset + len(customers_data)}件目を表示")
+            if has_more:
+                lines.append("続きを見るには「次へ」と入力してください。")
             
-            logger.info(f"Customer list formatted: {len(customers_data)} customers")
-            return result
+            logger.info(f"Customer list formatted: {len(customers_data)} customers (offset {offset})")
+            return "\n".join(lines)
             
         except Exception as e:
             logger.error(f"Error formatting customer list: {e}")
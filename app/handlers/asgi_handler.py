@@ -0,0 +1,94 @@
+from linebot import WebhookParser
+from linebot.models import MessageEvent, TextMessage
+from app.config import Config
+from app.services.database import AsyncDatabase
+from app.services.customer_service import customer_service
+from app.services.appointment_service import appointment_service
+from app.services.stats_service import client_stats_service
+from app.handlers.ai_handler import ai_handler
+from app.handlers.line_handler import process_message_async
+from app.utils.validators import sanitize_input
+from app.utils.message_renderer import split_messages
+from app.utils.logging_config import log_payload, user_id_var
+from typing import List
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+LINE_REPLY_URL = 'https://api.line.me/v2/bot/message/reply'
+
+# 署名検証・イベント解析（CPU処理のみのため同期版をそのまま使用）
+parser = WebhookParser(Config.LINE_CHANNEL_SECRET)
+
+class AsyncLineBotApi:
+    """httpx による LINE 応答送信（非同期版）"""
+
+    def __init__(self, client: httpx.AsyncClient = None):
+        self.client = client or httpx.AsyncClient(
+            timeout=10,
+            headers={'Authorization': f'Bearer {Config.LINE_CHANNEL_ACCESS_TOKEN}'}
+        )
+
+    async def reply_message(self, reply_token: str, texts: List[str]):
+        """テキストメッセージで応答"""
+        response = await self.client.post(LINE_REPLY_URL, json={
+            'replyToken': reply_token,
+            'messages': [{'type': 'text', 'text': text} for text in texts]
+        })
+        response.raise_for_status()
+
+    async def close(self):
+        await self.client.aclose()
+
+line_bot_api = AsyncLineBotApi()
+async_db = AsyncDatabase()
+
+def use_async_backends():
+    """サービス層を非同期クライアントに切り替え（ASGI プロセス起動時に1回だけ呼ぶ）"""
+    customer_service.db = async_db
+    appointment_service.db = async_db
+    client_stats_service.db = async_db
+    ai_handler.use_async_client()
+    logger.info("Async backends configured")
+
+async def shutdown_async_backends():
+    """接続を閉じる"""
+    await line_bot_api.close()
+    await ai_handler.close_async_client()
+    await async_db.close()
+
+async def handle_events(body: str, signature: str):
+    """Webhook イベントを処理（署名不正時は InvalidSignatureError）"""
+    for event in parser.parse(body, signature):
+        if isinstance(event, MessageEvent) and isinstance(event.message, TextMessage):
+            await handle_message(event)
+
+async def handle_message(event):
+    """LINE メッセージハンドラー（非同期版）"""
+    try:
+        user_id = event.source.user_id
+        user_id_var.set(user_id)
+        user_message = sanitize_input(event.message.text)
+
+        log_payload(logger, "Message received", user_message,
+                    sample_rate=Config.LOG_SAMPLE_RATE, redact=Config.LOG_REDACT_BODIES)
+
+        # メッセージ処理（同期モードと共通）
+        response = await process_message_async(user_id, user_message)
+
+        # 応答送信（LINE の文字数・通数制限に合わせて分割）
+        await line_bot_api.reply_message(event.reply_token, split_messages(response))
+        logger.info(f"Response sent to {user_id}")
+
+    except httpx.HTTPError as e:
+        logger.error(f"LINE Bot API Error: {e}")
+    except Exception as e:
+        logger.error(f"Error handling message: {e}")
+        try:
+            await line_bot_api.reply_message(
+                event.reply_token,
+                ["エラーが発生しました。もう一度お試しください。"]
+            )
+        except Exception:
+            pass
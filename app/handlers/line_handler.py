@@ -4,9 +4,16 @@ from linebot.exceptions import LineBotApiError
 from app.config import Config
 from app.services.customer_service import customer_service
 from app.services.appointment_service import appointment_service
+from app.services.stats_service import client_stats_service
 from app.handlers.ai_handler import ai_handler
-from app.utils.session import get_session, update_session, reset_session
-from app.utils.validators import is_numeric_id, sanitize_input
+from app.handlers.state_machine import (
+    StateMachine, Transition, ANY, FREE_INPUT, CMD_RECORD, CMD_HISTORY, NEXT, CHOICE, NUMBER, TEXT,
+    RECORD_DATE, RECORD_TIME, RECORD_CLIENT, RECORD_DETAIL, RECORD_CONFIRM, HISTORY_SELECT
+)
+from app.utils.validators import sanitize_input
+from app.utils.message_renderer import split_messages
+from app.utils.logging_config import log_payload, user_id_var
+from app.utils.aio import run_sync
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,17 +27,19 @@ def handle_message(event):
     """LINE メッセージハンドラー"""
     try:
         user_id = event.source.user_id
+        user_id_var.set(user_id)
         user_message = sanitize_input(event.message.text)
         
-        logger.info(f"Message from {user_id}: {user_message}")
+        log_payload(logger, "Message received", user_message,
+                    sample_rate=Config.LOG_SAMPLE_RATE, redact=Config.LOG_REDACT_BODIES)
         
         # メッセージ処理
         response = process_message(user_id, user_message)
         
-        # 応答送信
+        # 応答送信（LINE の文字数・通数制限に合わせて分割）
         line_bot_api.reply_message(
             event.reply_token,
-            TextSendMessage(text=response)
+            [TextSendMessage(text=text) for text in split_messages(response)]
         )
         logger.info(f"Response sent to {user_id}")
         
@@ -46,87 +55,97 @@ def handle_message(event):
         except:
             pass
 
+async def handle_unknown(user_id: str, message: str, session: dict) -> Transition:
+    """デフォルト応答"""
+    return Transition("「記録」または「履歴」を入力してください。")
+
+# 会話の遷移表（新しいフローは @conversation.on で状態と入力分類を登録する）
+conversation = StateMachine(default=handle_unknown)
+
 def process_message(user_id: str, message: str) -> str:
-    """メッセージ処理のメインロジック"""
-    
-    session = get_session(user_id)
-    number = session.get('number', 0)
-    handle_type = session.get('handle_type', '0')
-    
-    # 初期化コマンド（記録・履歴）
-    if '記録' in message or '履歴' in message:
-        return handle_initial_command(user_id, message)
-    
-    # 履歴モードでの顧客ID入力
-    if handle_type == '2' and number == 1:
-        return handle_history_customer_selection(user_id, message)
-    
-    # 記録モードのフロー処理
-    if handle_type == '1':
-        if number == 1:
-            return handle_date_input(user_id, message, session)
-        elif number == 2:
-            return handle_time_input(user_id, message, session)
-        elif number == 3:
-            return handle_customer_input(user_id, message, session)
-        elif number == 4:
-            return handle_appointment_detail_input(user_id, message, session)
-        elif number == 0 and message in ['1', '2', '3', '4', '5']:
-            return handle_confirmation_choice(user_id, message, session)
-    
-    # デフォルト応答
-    return "「記録」または「履歴」を入力してください。"
+    """メッセージ処理（同期モード）"""
+    return run_sync(process_message_async(user_id, message))
 
-def handle_initial_command(user_id: str, message: str) -> str:
-    """初期コマンド処理"""
-    reset_session(user_id)
+async def process_message_async(user_id: str, message: str) -> str:
+    """メッセージ処理のメインロジック（同期・ASGI モード共通）"""
+    return await conversation.dispatch(user_id, message)
+
+@conversation.on(ANY, CMD_RECORD)
+async def handle_record_command(user_id: str, message: str, session: dict) -> Transition:
+    """「記録」コマンド処理"""
+    return Transition("📅 日付を入力してください。\n例: 2025/11/17", {'state': RECORD_DATE}, reset=True)
+
+@conversation.on(ANY, CMD_HISTORY)
+async def handle_history_command(user_id: str, message: str, session: dict) -> Transition:
+    """「履歴」コマンド処理"""
+    return await render_customer_page(user_id, cursor=None, offset=0, reset=True)
+
+@conversation.on(HISTORY_SELECT, NEXT)
+async def handle_next_page(user_id: str, message: str, session: dict) -> Transition:
+    """顧客リストのページ送り"""
+    return await render_customer_page(user_id, session.get('list_cursor'), session.get('list_offset', 0))
+
+async def render_customer_page(user_id: str, cursor, offset: int, reset: bool = False) -> Transition:
+    """顧客リストの1ページを表示（キーセット位置から続きを取得）"""
+    page_size = Config.CUSTOMER_LIST_PAGE_SIZE
     
-    if '記録' in message:
-        update_session(user_id, {'handle_type': '1', 'number': 1})
-        return "📅 日付を入力してください。\n例: 2025/11/17"
+    # 次ページの有無を判定するため1件多く取得
+    customers = await client_stats_service.get_customer_stats(user_id, limit=page_size + 1, after=cursor)
+    has_more = len(customers) > page_size
+    customers = customers[:page_size]
     
-    elif '履歴' in message:
-        update_session(user_id, {'handle_type': '2', 'number': 1})
-        customers = customer_service.get_customers(user_id)
-        
-        if not customers:
-            reset_session(user_id)
-            return "📋 顧客データがありません。\n\nまずは「記録」から商談を記録してください。"
-        
-        formatted_list = ai_handler.format_customer_list(customers)
-        return f"{formatted_list}\n\n履歴を見たい顧客のIDを入力してください。"
+    if not customers:
+        if cursor:
+            return Transition("📋 これ以上顧客はありません。\n\n履歴を見たい顧客のIDを入力してください。")
+        return Transition("📋 顧客データがありません。\n\nまずは「記録」から商談を記録してください。", reset=True)
     
-    return "「記録」または「履歴」を入力してください。"
+    last = customers[-1]
+    formatted_list = ai_handler.format_customer_list(customers, offset=offset, has_more=has_more)
+    return Transition(
+        f"{formatted_list}\n\n履歴を見たい顧客のIDを入力してください。",
+        {
+            'state': HISTORY_SELECT,
+            'list_cursor': (last['last_contact_at'], last['id']),
+            'list_offset': offset + len(customers)
+        },
+        reset=reset
+    )
 
-def handle_date_input(user_id: str, message: str, session: dict) -> str:
+@conversation.on(RECORD_DATE, FREE_INPUT, free_text=True)
+async def handle_date_input(user_id: str, message: str, session: dict) -> Transition:
     """日付入力処理"""
-    update_session(user_id, {'date': message, 'number': 2})
-    return "🕐 時間を入力してください。\n例: 14:30"
+    return Transition("🕐 時間を入力してください。\n例: 14:30", {'date': message, 'state': RECORD_TIME})
 
-def handle_time_input(user_id: str, message: str, session: dict) -> str:
+@conversation.on(RECORD_TIME, FREE_INPUT, free_text=True)
+async def handle_time_input(user_id: str, message: str, session: dict) -> Transition:
     """時間入力処理"""
-    update_session(user_id, {'time': message, 'number': 3})
-    return "👤 顧客名を入力してください。\n\n過去に記録した顧客の場合は、顧客IDでも入力できます。"
-
-def handle_customer_input(user_id: str, message: str, session: dict) -> str:
-    """顧客名/ID入力処理"""
-    if is_numeric_id(message):
-        # ID入力の場合
-        customer = customer_service.get_customer_by_id(int(message), user_id)
-        if customer:
-            update_session(user_id, {'client': customer['client'], 'number': 4})
-            return f"✅ 顧客: {customer['client']}\n\n📝 商談内容を入力してください。\n※商談できなかった場合は「なし」と送信してください。"
-        else:
-            return "❌ 該当する顧客が見つかりません。\n\n顧客名を直接入力するか、正しいIDを入力してください。"
-    else:
-        # 名前入力の場合
-        update_session(user_id, {'client': message, 'number': 4})
-        return "📝 商談内容を入力してください。\n※商談できなかった場合は「なし」と送信してください。"
-
-def handle_appointment_detail_input(user_id: str, message: str, session: dict) -> str:
+    return Transition(
+        "👤 顧客名を入力してください。\n\n過去に記録した顧客の場合は、顧客IDでも入力できます。",
+        {'time': message, 'state': RECORD_CLIENT}
+    )
+
+@conversation.on(RECORD_CLIENT, (CHOICE, NUMBER), free_text=True)
+async def handle_customer_id_input(user_id: str, message: str, session: dict) -> Transition:
+    """顧客ID入力処理"""
+    customer = await customer_service.get_customer_by_id(int(message), user_id)
+    if customer:
+        return Transition(
+            f"✅ 顧客: {customer['client']}\n\n📝 商談内容を入力してください。\n※商談できなかった場合は「なし」と送信してください。",
+            {'client': customer['client'], 'state': RECORD_DETAIL}
+        )
+    return Transition("❌ 該当する顧客が見つかりません。\n\n顧客名を直接入力するか、正しいIDを入力してください。")
+
+@conversation.on(RECORD_CLIENT, (NEXT, TEXT), free_text=True)
+async def handle_customer_name_input(user_id: str, message: str, session: dict) -> Transition:
+    """顧客名入力処理"""
+    return Transition(
+        "📝 商談内容を入力してください。\n※商談できなかった場合は「なし」と送信してください。",
+        {'client': message, 'state': RECORD_DETAIL}
+    )
+
+@conversation.on(RECORD_DETAIL, FREE_INPUT, free_text=True)
+async def handle_appointment_detail_input(user_id: str, message: str, session: dict) -> Transition:
     """商談内容入力処理"""
-    update_session(user_id, {'appointment_detail': message, 'number': 0})
-    
     confirmation = f"""
 ✅ 以下の内容で記録します:
 
@@ -143,78 +162,67 @@ def handle_appointment_detail_input(user_id: str, message: str, session: dict) -
 4️⃣ 顧客名を修正
 5️⃣ 商談内容を修正
 """
-    return confirmation
+    return Transition(confirmation, {'appointment_detail': message, 'state': RECORD_CONFIRM})
 
-def handle_confirmation_choice(user_id: str, choice: str, session: dict) -> str:
+# 確認画面の修正選択肢 → (遷移先の状態, 応答)
+CORRECTION_CHOICES = {
+    '2': (RECORD_DATE, "📅 日付を入力してください。"),
+    '3': (RECORD_TIME, "🕐 時間を入力してください。"),
+    '4': (RECORD_CLIENT, "👤 顧客名を入力してください。"),
+    '5': (RECORD_DETAIL, "📝 商談内容を入力してください。"),
+}
+
+@conversation.on(RECORD_CONFIRM, CHOICE)
+async def handle_confirmation_choice(user_id: str, choice: str, session: dict) -> Transition:
     """確認画面での選択処理"""
-    if choice == '1':
-        # 記録実行
-        try:
-            # 顧客登録（存在しない場合）
-            if not customer_service.customer_exists(session['client'], user_id):
-                customer_service.create_customer(session['client'], user_id, user_id)
-                logger.info(f"New customer created: {session['client']}")
-            
-            # 商談記録
-            appointment_data = {
-                'date': session['date'],
-                'time': session['time'],
-                'client': session['client'],
-                'appointment_detail': session['appointment_detail'],
-                'sys_user_id': user_id,
-                'sys_conversation_id': user_id
-            }
-            appointment_service.create_appointment(appointment_data)
-            
-            reset_session(user_id)
-            return "✅ 記録しました！\n\n営業お疲れ様でした！💪"
-        except Exception as e:
-            logger.error(f"Error saving appointment: {e}")
-            return "❌ 記録中にエラーが発生しました。もう一度お試しください。"
-    
-    elif choice == '2':
-        update_session(user_id, {'number': 1})
-        return "📅 日付を入力してください。"
+    if choice in CORRECTION_CHOICES:
+        state, reply = CORRECTION_CHOICES[choice]
+        return Transition(reply, {'state': state})
     
-    elif choice == '3':
-        update_session(user_id, {'number': 2})
-        return "🕐 時間を入力してください。"
-    
-    elif choice == '4':
-        update_session(user_id, {'number': 3})
-        return "👤 顧客名を入力してください。"
-    
-    elif choice == '5':
-        update_session(user_id, {'number': 4})
-        return "📝 商談内容を入力してください。"
-    
-    return "1〜5の数字を入力してください。"
+    # 記録実行
+    try:
+        # 商談記録（未登録の顧客は同じトランザクションで登録）
+        appointment_data = {
+            'date': session['date'],
+            'time': session['time'],
+            'client': session['client'],
+            'appointment_detail': session['appointment_detail'],
+            'sys_user_id': user_id,
+            'sys_conversation_id': user_id
+        }
+        if not await appointment_service.create_appointment(appointment_data):
+            return Transition("❌ 記録中にエラーが発生しました。もう一度お試しください。")
+        
+        return Transition("✅ 記録しました！\n\n営業お疲れ様でした！💪", reset=True)
+    except Exception as e:
+        logger.error(f"Error saving appointment: {e}")
+        return Transition("❌ 記録中にエラーが発生しました。もう一度お試しください。")
 
-def handle_history_customer_selection(user_id: str, message: str) -> str:
+@conversation.on(HISTORY_SELECT, (CHOICE, NUMBER))
+async def handle_history_customer_selection(user_id: str, message: str, session: dict) -> Transition:
     """履歴表示の顧客選択処理"""
     try:
-        customer_id = int(message)
-        customer = customer_service.get_customer_by_id(customer_id, user_id)
+        customer = await customer_service.get_customer_by_id(int(message), user_id)
         
         if not customer:
-            return "❌ 該当する顧客が見つかりません。\n\n正しいIDを入力してください。"
+            return Transition("❌ 該当する顧客が見つかりません。\n\n正しいIDを入力してください。")
         
         # 商談履歴取得
-        appointments = appointment_service.get_appointments(user_id, customer['client'])
+        appointments = await appointment_service.get_appointments(user_id, customer['client'])
         
         if not appointments:
-            reset_session(user_id)
-            return f"📋 {customer['client']} の商談履歴はありません。"
+            return Transition(f"📋 {customer['client']} の商談履歴はありません。", reset=True)
         
         # AI アドバイス生成
-        advice = ai_handler.generate_sales_advice(appointments)
+        advice = await ai_handler.generate_sales_advice(appointments)
         
-        reset_session(user_id)
-        return f"📊 {customer['client']} の営業分析\n\n{advice}"
+        return Transition(f"📊 {customer['client']} の営業分析\n\n{advice}", reset=True)
         
-    except ValueError:
-        return "❌ 数字で入力してください。"
     except Exception as e:
         logger.error(f"Error in history selection: {e}")
-        reset_session(user_id)
-        return "エラーが発生しました。もう一度「履歴」から始めてください。"
\ No newline at end of file
+        return Transition("エラーが発生しました。もう一度「履歴」から始めてください。", reset=True)
+
+@conversation.on(HISTORY_SELECT, TEXT)
+async def handle_history_invalid_input(user_id: str, message: str, session: dict) -> Transition:
+    """履歴表示の顧客選択で数字以外が入力された場合"""
+    return Transition("❌ 数字で入力してください。")
\ No newline at end of file
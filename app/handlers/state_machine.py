@@ -0,0 +1,137 @@
+from typing import Awaitable, Callable, Dict, Iterable, NamedTuple, Optional, Tuple, Union
+from app.utils.session import get_session, update_session, reset_session
+import asyncio
+import weakref
+
+# 会話状態
+IDLE = 'idle'
+RECORD_DATE = 'record_date'
+RECORD_TIME = 'record_time'
+RECORD_CLIENT = 'record_client'
+RECORD_DETAIL = 'record_detail'
+RECORD_CONFIRM = 'record_confirm'
+HISTORY_SELECT = 'history_select'
+
+# 入力の分類
+CMD_RECORD = 'cmd_record'    # 「記録」（自由入力の状態では完全一致のみ）
+CMD_HISTORY = 'cmd_history'  # 「履歴」（自由入力の状態では完全一致のみ）
+NEXT = 'next'                # 「次へ」
+CHOICE = 'choice'            # 1〜5（確認画面の選択肢）
+NUMBER = 'number'            # その他の数字
+TEXT = 'text'                # 上記以外
+
+INPUT_CLASSES = (CMD_RECORD, CMD_HISTORY, NEXT, CHOICE, NUMBER, TEXT)
+CHOICE_INPUTS = frozenset(('1', '2', '3', '4', '5'))
+FREE_INPUT = (NEXT, CHOICE, NUMBER, TEXT)  # コマンド以外の全入力
+ANY = '*'
+
+class Transition(NamedTuple):
+    """ハンドラーの処理結果（セッション変更は dispatch でまとめて1回だけ書き込む）"""
+    reply: str
+    changes: Optional[Dict] = None  # セッションへの変更（state を含む）
+    reset: bool = False             # True の場合は初期状態に changes を適用
+
+Handler = Callable[[str, str, Dict], Awaitable[Transition]]
+
+def classify(message: str, free_text: bool = False) -> str:
+    """入力を分類
+
+    free_text が True（日付・顧客名・商談内容などを入力中）の場合、
+    コマンドは完全一致のみとし、「前回の記録を確認」のような入力はデータとして扱う。
+    """
+    if free_text:
+        if message == '記録':
+            return CMD_RECORD
+        if message == '履歴':
+            return CMD_HISTORY
+    elif '記録' in message:
+        return CMD_RECORD
+    elif '履歴' in message:
+        return CMD_HISTORY
+    if message == '次へ':
+        return NEXT
+    # is_numeric_id と同じ判定（正規表現を使わず高速化）
+    if message.isdecimal():
+        return CHOICE if message in CHOICE_INPUTS else NUMBER
+    return TEXT
+
+class StateMachine:
+    """(状態, 入力分類) → ハンドラーの遷移表
+
+    ANY を指定した登録は登録時に全状態・全分類へ展開するため、
+    dispatch 時は1回の辞書参照で遷移先が決まる。
+    具体的な登録は ANY より優先され、後から登録したものが上書きする。
+    """
+
+    def __init__(self, default: Handler):
+        self.default = default
+        self.table: Dict[Tuple[str, str], Handler] = {}
+        self.states = {IDLE}
+        self.free_text_states = set()
+        self._wildcards: Dict[Tuple[str, str], Handler] = {}
+        self._explicit: Dict[Tuple[str, str], Handler] = {}
+        # ユーザーごとのロック（処理中のユーザーがいなくなれば自動的に破棄される）
+        self._locks: 'weakref.WeakValueDictionary[str, asyncio.Lock]' = weakref.WeakValueDictionary()
+
+    def on(self, states: Union[str, Iterable[str]], inputs: Union[str, Iterable[str]],
+           free_text: bool = False):
+        """遷移を登録するデコレーター
+
+        free_text=True の状態では入力をデータとして扱い、コマンドは完全一致のみ受け付ける。
+        """
+        states = (states,) if isinstance(states, str) else tuple(states)
+        inputs = (inputs,) if isinstance(inputs, str) else tuple(inputs)
+        if free_text:
+            self.free_text_states.update(states)
+
+        def register(handler: Handler) -> Handler:
+            for state in states:
+                for input_class in inputs:
+                    key = (state, input_class)
+                    if ANY in key:
+                        self._wildcards[key] = handler
+                    else:
+                        self._explicit[key] = handler
+                    if state != ANY:
+                        self.states.add(state)
+            self._build()
+            return handler
+        return register
+
+    def _build(self):
+        """ワイルドカードを展開して遷移表を再構築"""
+        table = {}
+        # 優先度の低い順に適用: (ANY, ANY) < (状態, ANY) < (ANY, 分類) < 明示登録
+        for (state, input_class), handler in sorted(
+            self._wildcards.items(), key=lambda item: (item[0][1] != ANY) * 2 + (item[0][0] != ANY)
+        ):
+            for s in (self.states if state == ANY else (state,)):
+                for c in (INPUT_CLASSES if input_class == ANY else (input_class,)):
+                    table[(s, c)] = handler
+        table.update(self._explicit)
+        self.table = table
+
+    def resolve(self, state: str, message: str) -> Handler:
+        """遷移先ハンドラーを取得"""
+        return self.table.get((state, classify(message, state in self.free_text_states)), self.default)
+
+    async def dispatch(self, user_id: str, message: str) -> str:
+        """メッセージを処理し、セッション変更を1回の書き込みで適用
+
+        同一ユーザーのメッセージはセッション取得から書き込みまでロックして順に処理し、
+        応答待ちの遷移が後から届いたメッセージの遷移を上書きしないようにする。
+        """
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+
+        async with lock:
+            session = get_session(user_id)
+            handler = self.resolve(session.get('state', IDLE), message)
+            transition = await handler(user_id, message, session)
+
+            if transition.reset:
+                reset_session(user_id, transition.changes)
+            elif transition.changes:
+                update_session(user_id, transition.changes)
+            return transition.reply
@@ -1,4 +1,7 @@
 from app.services.database import db
+from app.utils.aio import resolve
+from app.services.customer_service import customer_service
+from app.services.stats_service import client_stats_service
 from typing import Dict, List, Optional
 import logging
 
@@ -8,14 +11,19 @@ class AppointmentService:
     def __init__(self):
         self.db = db
     
-    def create_appointment(self, data: Dict) -> Optional[Dict]:
-        """商談記録を作成"""
+    async def create_appointment(self, data: Dict) -> Optional[Dict]:
+        """商談記録を作成（顧客登録・顧客集計も同一トランザクションで更新）"""
         try:
-            query = """
-                INSERT INTO appointments 
-                (date, time, client, appointment_detail, sys_user_id, sys_conversation_id)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING *
+            query = f"""
+                WITH inserted AS (
+                    INSERT INTO appointments 
+                    (date, time, client, appointment_detail, sys_user_id, sys_conversation_id)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    RETURNING *
+                ), stats AS (
+                    {client_stats_service.upsert_from('inserted')}
+                )
+                SELECT * FROM inserted
             """
             params = (
                 data.get('date'),
@@ -25,14 +33,20 @@ class AppointmentService:
                 data.get('sys_user_id'),
                 data.get('sys_conversation_id')
             )
-            result = self.db.execute_insert(query, params)
-            logger.info(f"Appointment created for client: {data.get('client')}")
+            results = await resolve(self.db.execute_transaction([
+                customer_service.build_ensure(
+                    data.get('client'), data.get('sys_user_id'), data.get('sys_conversation_id')
+                ),
+                (query, params)
+            ]))
+            result = results[1]
+            logger.info(f"Appointment created: id={result['id'] if result else None}")
             return result
         except Exception as e:
             logger.error(f"Error creating appointment: {e}")
             return None
     
-    def get_appointments(self, conversation_id: str, client_name: str = None) -> List[Dict]:
+    async def get_appointments(self, conversation_id: str, client_name: str = None) -> List[Dict]:
         """商談履歴を取得"""
         try:
             if client_name:
@@ -41,14 +55,14 @@ class AppointmentService:
                     WHERE sys_conversation_id = %s AND client = %s
                     ORDER BY created_at DESC
                 """
-                results = self.db.execute_query(query, (conversation_id, client_name))
+                results = await resolve(self.db.execute_query(query, (conversation_id, client_name)))
             else:
                 query = """
                     SELECT * FROM appointments
                     WHERE sys_conversation_id = %s
                     ORDER BY created_at DESC
                 """
-                results = self.db.execute_query(query, (conversation_id,))
+                results = await resolve(self.db.execute_query(query, (conversation_id,)))
             
             return results
         except Exception as e:
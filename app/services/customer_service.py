@@ -1,5 +1,6 @@
 from app.services.database import db
-from typing import List, Dict, Optional
+from app.utils.aio import resolve
+from typing import List, Dict, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,7 +9,7 @@ class CustomerService:
     def __init__(self):
         self.db = db
     
-    def create_customer(self, customer_name: str, user_id: str, conversation_id: str) -> Optional[Dict]:
+    async def create_customer(self, customer_name: str, user_id: str, conversation_id: str) -> Optional[Dict]:
         """顧客を作成"""
         try:
             query = """
@@ -16,14 +17,28 @@ class CustomerService:
                 VALUES (%s, %s, %s)
                 RETURNING *
             """
-            result = self.db.execute_insert(query, (customer_name, user_id, conversation_id))
-            logger.info(f"Customer created: {customer_name}")
+            result = await resolve(self.db.execute_insert(query, (customer_name, user_id, conversation_id)))
+            logger.info(f"Customer created: id={result['id'] if result else None}")
             return result
         except Exception as e:
             logger.error(f"Error creating customer: {e}")
             return None
     
-    def get_customers(self, conversation_id: str) -> List[Dict]:
+    def build_ensure(self, customer_name: str, user_id: str, conversation_id: str) -> Tuple[str, tuple]:
+        """顧客が存在しない場合のみ登録するクエリを生成
+
+        商談記録と同じトランザクションで実行し、記録の失敗時に顧客だけが残らないようにする。
+        """
+        query = """
+            INSERT INTO clients (client, sys_user_id, sys_conversation_id)
+            SELECT %s, %s, %s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM clients WHERE client = %s AND sys_conversation_id = %s
+            )
+        """
+        return query, (customer_name, user_id, conversation_id, customer_name, conversation_id)
+    
+    async def get_customers(self, conversation_id: str) -> List[Dict]:
         """顧客リストを取得"""
         try:
             query = """
@@ -31,13 +46,13 @@ class CustomerService:
                 WHERE sys_conversation_id = %s
                 ORDER BY created_at DESC
             """
-            results = self.db.execute_query(query, (conversation_id,))
+            results = await resolve(self.db.execute_query(query, (conversation_id,)))
             return results
         except Exception as e:
             logger.error(f"Error getting customers: {e}")
             return []
     
-    def get_customer_by_id(self, customer_id: int, conversation_id: str) -> Optional[Dict]:
+    async def get_customer_by_id(self, customer_id: int, conversation_id: str) -> Optional[Dict]:
         """IDで顧客を取得"""
         try:
             query = """
@@ -45,13 +60,13 @@ class CustomerService:
                 WHERE id = %s AND sys_conversation_id = %s
                 LIMIT 1
             """
-            results = self.db.execute_query(query, (customer_id, conversation_id))
+            results = await resolve(self.db.execute_query(query, (customer_id, conversation_id)))
             return results[0] if results else None
         except Exception as e:
             logger.error(f"Error getting customer by ID: {e}")
             return None
     
-    def customer_exists(self, customer_name: str, conversation_id: str) -> bool:
+    async def customer_exists(self, customer_name: str, conversation_id: str) -> bool:
         """顧客が存在するか確認"""
         try:
             query = """
@@ -59,7 +74,7 @@ class CustomerService:
                 WHERE client = %s AND sys_conversation_id = %s
                 LIMIT 1
             """
-            results = self.db.execute_query(query, (customer_name, conversation_id))
+            results = await resolve(self.db.execute_query(query, (customer_name, conversation_id)))
             return bool(results)
         except Exception as e:
             logger.error(f"Error checking customer existence: {e}")
@@ -1,11 +1,25 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from app.config import Config
+import asyncio
 import logging
-from typing import List, Dict, Optional
+import re
+from typing import List, Dict, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+def _connection_params() -> Dict:
+    """Supabase URLからPostgreSQL接続パラメータを生成"""
+    # Supabase URLからproject_idを抽出
+    project_id = Config.SUPABASE_URL.replace('https://', '').replace('.supabase.co', '')
+    return {
+        'host': f'db.{project_id}.supabase.co',
+        'database': 'postgres',
+        'user': 'postgres',
+        'password': Config.SUPABASE_PASSWORD,
+        'port': 5432
+    }
+
 class Database:
     _instance = None
     _initialized = False
@@ -21,15 +35,8 @@ class Database:
             return
             
         try:
-            # Supabase URLからproject_idを抽出
-            project_id = Config.SUPABASE_URL.replace('https://', '').replace('.supabase.co', '')
-            
             self.conn_params = {
-                'host': f'db.{project_id}.supabase.co',
-                'database': 'postgres',
-                'user': 'postgres',
-                'password': Config.SUPABASE_PASSWORD,
-                'port': 5432,
+                **_connection_params(),
                 'sslmode': 'require',
                 'connect_timeout': 10
             }
@@ -120,6 +127,120 @@ class Database:
                 cursor.close()
             if conn:
                 conn.close()
+    
+    def execute_transaction(self, statements: List[Tuple[str, tuple]]) -> List[Optional[Dict]]:
+        """複数クエリを単一トランザクションで実行（全て成功した場合のみコミット）"""
+        if not self._initialized:
+            self._initialize()
+            
+        conn = None
+        cursor = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            results = []
+            for query, params in statements:
+                cursor.execute(query, params)
+                row = cursor.fetchone() if cursor.description else None
+                results.append(dict(row) if row else None)
+            conn.commit()
+            return results
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Transaction execution error: {e}")
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+
+class AsyncDatabase:
+    """asyncpg による非同期版（ASGI モード用、Database と同じインターフェース）"""
+    
+    def __init__(self, min_size: int = 1, max_size: int = 10):
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = None
+        self._lock = asyncio.Lock()
+    
+    async def _get_pool(self):
+        """コネクションプールを取得（初回のみ作成）"""
+        if self._pool is None:
+            async with self._lock:
+                if self._pool is None:
+                    import asyncpg
+                    self._pool = await asyncpg.create_pool(
+                        **_connection_params(),
+                        ssl='require',
+                        timeout=10,
+                        min_size=self.min_size,
+                        max_size=self.max_size
+                    )
+                    logger.info("PostgreSQL async pool created")
+        return self._pool
+    
+    async def close(self):
+        """コネクションプールを閉じる"""
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+    
+    async def execute_query(self, query: str, params: tuple = None) -> List[Dict]:
+        """SELECT クエリを実行"""
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(_to_asyncpg(query), *(params or ()))
+                return [dict(row) for row in rows]
+        except Exception as e:
+            logger.error(f"Query execution error: {e}")
+            raise
+    
+    async def execute_insert(self, query: str, params: tuple = None) -> Optional[Dict]:
+        """INSERT クエリを実行"""
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                row = await conn.fetchrow(_to_asyncpg(query), *(params or ()))
+                return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Insert execution error: {e}")
+            raise
+    
+    async def execute_update(self, query: str, params: tuple = None) -> int:
+        """UPDATE クエリを実行"""
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                status = await conn.execute(_to_asyncpg(query), *(params or ()))
+                # ステータス文字列（例: "UPDATE 3"）から件数を取得
+                last = status.split()[-1] if status else ''
+                return int(last) if last.isdigit() else 0
+        except Exception as e:
+            logger.error(f"Update execution error: {e}")
+            raise
+    
+    async def execute_transaction(self, statements: List[Tuple[str, tuple]]) -> List[Optional[Dict]]:
+        """複数クエリを単一トランザクションで実行（全て成功した場合のみコミット）"""
+        pool = await self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    results = []
+                    for query, params in statements:
+                        row = await conn.fetchrow(_to_asyncpg(query), *(params or ()))
+                        results.append(dict(row) if row else None)
+                    return results
+        except Exception as e:
+            logger.error(f"Transaction execution error: {e}")
+            raise
+
+def _to_asyncpg(query: str) -> str:
+    """psycopg2 形式のプレースホルダ（%s）を asyncpg 形式（$1, $2, ...）に変換"""
+    counter = iter(range(1, query.count('%s') + 1))
+    return re.sub(r'%s', lambda _: f'${next(counter)}', query)
 
 # シングルトンインスタンス
 db = Database()
\ No newline at end of file
@@ -0,0 +1,192 @@
+from app.services.database import db
+from app.utils.aio import resolve
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 最終商談内容のスニペット長
+NOTE_SNIPPET_LENGTH = 40
+
+# 顧客ごとの商談集計テーブル
+# appointments への INSERT と同一の文で更新する
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS client_stats (
+        sys_conversation_id TEXT NOT NULL,
+        client TEXT NOT NULL,
+        client_id BIGINT,
+        last_date TEXT,
+        last_contact_at TIMESTAMPTZ NOT NULL,
+        appointment_count INTEGER NOT NULL DEFAULT 0,
+        last_note TEXT,
+        PRIMARY KEY (sys_conversation_id, client)
+    );
+    CREATE INDEX IF NOT EXISTS idx_client_stats_recent
+        ON client_stats (sys_conversation_id, last_contact_at DESC, client_id DESC);
+"""
+
+# 整合性チェックで比較する項目
+STATS_FIELDS = ('client_id', 'last_date', 'last_contact_at', 'appointment_count', 'last_note')
+
+# appointments から集計した値（再構築・整合性チェック共通）
+_AGGREGATE = """
+    SELECT
+        l.sys_conversation_id,
+        l.client,
+        (
+            SELECT MIN(c.id) FROM clients c
+            WHERE c.client = l.client AND c.sys_conversation_id = l.sys_conversation_id
+        ) AS client_id,
+        l.date AS last_date,
+        l.created_at AS last_contact_at,
+        n.appointment_count,
+        LEFT(l.appointment_detail, {snippet}) AS last_note
+    FROM (
+        SELECT DISTINCT ON (sys_conversation_id, client) *
+        FROM appointments
+        WHERE {where}
+        ORDER BY sys_conversation_id, client, created_at DESC
+    ) l
+    JOIN (
+        SELECT sys_conversation_id, client, COUNT(*) AS appointment_count
+        FROM appointments
+        WHERE {where}
+        GROUP BY sys_conversation_id, client
+    ) n USING (sys_conversation_id, client)
+"""
+
+class ClientStatsService:
+    def __init__(self):
+        self.db = db
+    
+    async def ensure_schema(self) -> int:
+        """集計テーブルを作成し、空の場合は appointments から初期構築（冪等）
+
+        初期構築した件数を返す（既にデータがある場合は0）。
+        """
+        await resolve(self.db.execute_update(SCHEMA))
+        logger.info("client_stats schema ensured")
+        
+        rows = await resolve(self.db.execute_query("SELECT 1 FROM client_stats LIMIT 1"))
+        if rows:
+            return 0
+        return await self.rebuild()
+    
+    def upsert_from(self, source: str) -> str:
+        """source（appointments の行を返す CTE）から集計を更新するクエリを生成
+
+        appointments の INSERT ... RETURNING と同じ文で実行し、
+        再構築・整合性チェックと同じく created_at を最終商談日時とする。
+        """
+        return f"""
+            INSERT INTO client_stats
+            (sys_conversation_id, client, client_id, last_date, last_contact_at, appointment_count, last_note)
+            SELECT
+                a.sys_conversation_id,
+                a.client,
+                (
+                    SELECT MIN(c.id) FROM clients c
+                    WHERE c.client = a.client AND c.sys_conversation_id = a.sys_conversation_id
+                ),
+                a.date,
+                a.created_at,
+                1,
+                LEFT(a.appointment_detail, {NOTE_SNIPPET_LENGTH})
+            FROM {source} a
+            ON CONFLICT (sys_conversation_id, client) DO UPDATE SET
+                client_id = COALESCE(EXCLUDED.client_id, client_stats.client_id),
+                last_date = EXCLUDED.last_date,
+                last_contact_at = EXCLUDED.last_contact_at,
+                appointment_count = client_stats.appointment_count + 1,
+                last_note = EXCLUDED.last_note
+        """
+    
+    async def get_customer_stats(self, conversation_id: str, limit: Optional[int] = None,
+                                 after: Optional[Tuple] = None) -> List[Dict]:
+        """最終商談日の新しい順に顧客集計を取得
+
+        after には直前ページ末尾の (last_contact_at, id) を渡す（キーセットページング）。
+        """
+        try:
+            conditions = ["sys_conversation_id = %s", "client_id IS NOT NULL"]
+            params: list = [conversation_id]
+            if after:
+                conditions.append("(last_contact_at, client_id) < (%s, %s)")
+                params.extend(after)
+            query = f"""
+                SELECT client_id AS id, client, last_date, last_contact_at,
+                       appointment_count, last_note
+                FROM client_stats
+                WHERE {' AND '.join(conditions)}
+                ORDER BY last_contact_at DESC, client_id DESC
+            """
+            if limit:
+                query += " LIMIT %s"
+                params.append(limit)
+            return await resolve(self.db.execute_query(query, tuple(params)))
+        except Exception as e:
+            logger.error(f"Error getting customer stats: {e}")
+            return []
+    
+    async def rebuild(self, conversation_id: Optional[str] = None) -> int:
+        """appointments から集計テーブルを再構築"""
+        where, params = self._scope(conversation_id)
+        delete = f"DELETE FROM client_stats WHERE {where}"
+        insert = f"""
+            WITH rebuilt AS (
+                INSERT INTO client_stats
+                (sys_conversation_id, client, client_id, last_date, last_contact_at, appointment_count, last_note)
+                {_AGGREGATE.format(where=where, snippet=NOTE_SNIPPET_LENGTH)}
+                RETURNING 1
+            )
+            SELECT COUNT(*) AS count FROM rebuilt
+        """
+        # 集計クエリ内で条件を2回使用する
+        results = await resolve(self.db.execute_transaction([
+            (delete, params),
+            (insert, params * 2),
+        ]))
+        count = results[1]['count']
+        logger.info(f"client_stats rebuilt: {count} rows (scope={conversation_id or 'all'})")
+        return count
+    
+    async def check(self, conversation_id: Optional[str] = None) -> List[Dict]:
+        """集計テーブルと appointments の不整合を検出
+
+        各行の mismatched_fields に不一致の項目名を列挙する。
+        """
+        where, params = self._scope(conversation_id)
+        compared = ", ".join(
+            f"CASE WHEN e.{field} IS DISTINCT FROM s.{field} THEN '{field}' END"
+            for field in STATS_FIELDS
+        )
+        query = f"""
+            WITH expected AS ({_AGGREGATE.format(where=where, snippet=NOTE_SNIPPET_LENGTH)})
+            SELECT * FROM (
+                SELECT
+                    COALESCE(e.sys_conversation_id, s.sys_conversation_id) AS sys_conversation_id,
+                    COALESCE(e.client, s.client) AS client,
+                    CASE
+                        WHEN e.client IS NULL THEN 'missing_in_appointments'
+                        WHEN s.client IS NULL THEN 'missing_in_stats'
+                        ELSE concat_ws(', ', {compared})
+                    END AS mismatched_fields,
+                    e.appointment_count AS expected_count,
+                    s.appointment_count AS actual_count
+                FROM expected e
+                FULL OUTER JOIN (
+                    SELECT * FROM client_stats WHERE {where}
+                ) s USING (sys_conversation_id, client)
+            ) diff
+            WHERE mismatched_fields <> ''
+        """
+        return await resolve(self.db.execute_query(query, params * 3))
+    
+    def _scope(self, conversation_id: Optional[str]) -> Tuple[str, tuple]:
+        """対象範囲の WHERE 条件"""
+        if conversation_id:
+            return "sys_conversation_id = %s", (conversation_id,)
+        return "TRUE", ()
+
+# シングルトンインスタンス
+client_stats_service = ClientStatsService()
@@ -0,0 +1,28 @@
+from typing import Any, Coroutine, TypeVar
+import inspect
+
+T = TypeVar('T')
+
+async def resolve(value: Any) -> Any:
+    """同期・非同期どちらのクライアントの戻り値も受け取る
+
+    同期クライアント（psycopg2, Anthropic）の結果はそのまま返し、
+    非同期クライアント（asyncpg, AsyncAnthropic）の結果は await する。
+    """
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """同期クライアントのみを使うコルーチンをイベントループなしで実行
+
+    同期モードでは resolve() が一度も中断しないため、
+    1回の send() で完了する。中断した場合は非同期クライアントが
+    混在しているので、ASGI エントリーポイントから実行すること。
+    """
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    coro.close()
+    raise RuntimeError("Coroutine suspended in sync mode; use the ASGI entry point")
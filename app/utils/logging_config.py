@@ -0,0 +1,123 @@
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from app.config import Config
+import atexit
+import copy
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import random
+import sys
+
+# リクエスト単位の相関ID（スレッド・asyncio タスクごとに独立）
+request_id_var: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+user_id_var: ContextVar[Optional[str]] = ContextVar('user_id', default=None)
+
+_listener: Optional[QueueListener] = None
+_exc_formatter = logging.Formatter()
+
+class ContextFilter(logging.Filter):
+    """ログレコードに相関IDを付与"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.user_id = user_id_var.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """1行1レコードの JSON 形式でフォーマット"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'user_id': getattr(record, 'user_id', None),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        if record.stack_info:
+            entry['stack_info'] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False)
+
+class StructuredQueueHandler(QueueHandler):
+    """トレースバックをメッセージに連結せず exc_text のまま渡す QueueHandler
+
+    標準の prepare はトレースバックを msg に連結して exc_info を破棄するため、
+    JSON 出力で exc_info を独立した項目にできない。
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        # トレースバックオブジェクトはフレームを保持するため文字列化してから渡す
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+def setup_logging(level: str = 'INFO', fmt: str = 'json', stream=None) -> QueueListener:
+    """キュー経由の非同期ログ出力を設定
+
+    リクエスト処理スレッドはキューへの投入のみ行い、
+    実際の出力はバックグラウンドスレッドの QueueListener が担当する。
+    """
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if fmt == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+        ))
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = StructuredQueueHandler(log_queue)
+    # 相関IDは呼び出し元のコンテキストで取得する必要があるためキュー投入前に付与
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+@atexit.register
+def stop_logging():
+    """キューに残ったログを出力してリスナーを停止"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+def log_payload(logger: logging.Logger, label: str, body: str,
+                sample_rate: float = 1.0, redact: bool = True):
+    """メッセージ本文をサンプリング・マスキングしてログ出力"""
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    logger.info(f"{label}: {redact_body(body) if redact else body}")
+
+def redact_body(body: str) -> str:
+    """本文を長さと鍵付きハッシュのみに置き換え（同一内容の突き合わせ用）
+
+    短い入力（氏名・日付・ID）は辞書攻撃で復元できるため、素のハッシュは使わない。
+    LOG_REDACT_KEY が未設定の場合は長さのみ記録する。
+    """
+    if not Config.LOG_REDACT_KEY:
+        return f"<redacted len={len(body)}>"
+    digest = hmac.new(
+        Config.LOG_REDACT_KEY.encode('utf-8'), body.encode('utf-8'), hashlib.sha256
+    ).hexdigest()[:16]
+    return f"<redacted len={len(body)} hmac={digest}>"
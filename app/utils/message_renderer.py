@@ -0,0 +1,70 @@
+from typing import List, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+# LINE Messaging API の制限
+LINE_MAX_TEXT_LENGTH = 5000      # テキストメッセージ1通あたりの最大文字数
+LINE_MAX_MESSAGES_PER_REPLY = 5  # 1回の応答で送信できる最大メッセージ数
+
+TRUNCATED_SUFFIX = "\n…（文字数制限のため省略されました）"
+EMPTY_FALLBACK = "（応答内容がありません）"
+
+def split_messages(
+    response: Union[str, List[str]],
+    limit: int = LINE_MAX_TEXT_LENGTH,
+    max_messages: int = LINE_MAX_MESSAGES_PER_REPLY
+) -> List[str]:
+    """応答テキストを LINE の制限内に収まるメッセージへ分割
+
+    行単位で詰め込み、1行が上限を超える場合のみ行の途中で分割する。
+    上限通数を超える分は最後のメッセージを切り詰めて省略表示する。
+    LINE は空のテキストや空の messages 配列を受け付けないため、
+    空白のみのメッセージは除外し、必ず1通以上を返す。
+    """
+    texts = [response] if isinstance(response, str) else response
+
+    chunks: List[str] = []
+    for text in texts:
+        chunks.extend(chunk for chunk in _split_text(text, limit) if chunk.strip())
+
+    if not chunks:
+        return [EMPTY_FALLBACK]
+
+    if len(chunks) > max_messages:
+        logger.warning(f"Response truncated: {len(chunks)} chunks > {max_messages}")
+        chunks = chunks[:max_messages]
+        last = chunks[-1][:limit - len(TRUNCATED_SUFFIX)]
+        chunks[-1] = last + TRUNCATED_SUFFIX
+
+    return chunks
+
+def _split_text(text: str, limit: int) -> List[str]:
+    """1つのテキストを上限文字数ごとに分割"""
+    if len(text) <= limit:
+        return [text]
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in text.split("\n"):
+        # 1行で上限を超える場合は強制分割
+        while len(line) > limit:
+            if current:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            chunks.append(line[:limit])
+            line = line[limit:]
+
+        # 改行分の1文字を加算
+        added = len(line) + (1 if current else 0)
+        if size + added > limit:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+            added = len(line)
+        current.append(line)
+        size += added
+
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
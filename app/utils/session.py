@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -7,18 +7,23 @@ logger = logging.getLogger(__name__)
 # 本番環境ではRedisやMemcachedの使用を推奨
 user_sessions: Dict[str, Dict] = {}
 
+def _default_session() -> Dict:
+    """初期状態のセッション"""
+    return {
+        'state': 'idle',
+        'date': '0',
+        'time': '0',
+        'client': '0',
+        'appointment_detail': '0',
+        'deal_with_result': '0',
+        'list_cursor': None,
+        'list_offset': 0
+    }
+
 def get_session(user_id: str) -> Dict:
     """セッション取得"""
     if user_id not in user_sessions:
-        user_sessions[user_id] = {
-            'number': 0,
-            'handle_type': '0',
-            'date': '0',
-            'time': '0',
-            'client': '0',
-            'appointment_detail': '0',
-            'deal_with_result': '0'
-        }
+        user_sessions[user_id] = _default_session()
         logger.info(f"New session created for user: {user_id}")
     return user_sessions[user_id]
 
@@ -26,19 +31,15 @@ def update_session(user_id: str, data: Dict):
     """セッション更新"""
     session = get_session(user_id)
     session.update(data)
-    logger.debug(f"Session updated for user {user_id}: {data}")
+    # 入力内容（顧客名・商談内容など）は出力せず、更新した項目名のみ記録
+    logger.debug(f"Session updated for user {user_id}: {sorted(data)}")
 
-def reset_session(user_id: str):
-    """セッションリセット"""
-    user_sessions[user_id] = {
-        'number': 0,
-        'handle_type': '0',
-        'date': '0',
-        'time': '0',
-        'client': '0',
-        'appointment_detail': '0',
-        'deal_with_result': '0'
-    }
+def reset_session(user_id: str, data: Optional[Dict] = None):
+    """セッションリセット（data を指定した場合は初期状態に適用）"""
+    session = _default_session()
+    if data:
+        session.update(data)
+    user_sessions[user_id] = session
     logger.info(f"Session reset for user: {user_id}")
 
 def get_all_sessions() -> Dict:
@@ -0,0 +1,103 @@
+from linebot.exceptions import InvalidSignatureError
+from app.config import Config
+from app.handlers.asgi_handler import handle_events, use_async_backends, shutdown_async_backends
+from app.utils.logging_config import setup_logging, log_payload, request_id_var
+import json
+import logging
+import uuid
+
+# ログ設定（キュー経由の非同期出力）
+setup_logging(Config.LOG_LEVEL, Config.LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+# 設定検証
+try:
+    Config.validate()
+    logger.info("Configuration validated successfully")
+except ValueError as e:
+    logger.error(f"Configuration error: {e}")
+    raise
+
+# サービス層を非同期クライアントに切り替え
+use_async_backends()
+
+ERROR_BODIES = {
+    400: {"error": "Bad request"},
+    500: {"error": "Internal server error"}
+}
+
+async def app(scope, receive, send):
+    """ASGI アプリケーション（uvicorn asgi:app で起動）"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope['headers']}
+    request_id_var.set(headers.get('x-request-id') or uuid.uuid4().hex)
+    method, path = scope['method'], scope['path']
+
+    if path == '/' and method == 'GET':
+        return await respond(send, 200, {
+            "status": "running",
+            "service": "LINE Customer Management System",
+            "version": "1.0.0"
+        })
+    if path == '/webhook' and method == 'POST':
+        status = await webhook(headers, await read_body(receive))
+        return await respond(send, status, ERROR_BODIES.get(status, 'OK'))
+    return await respond(send, 404, {"error": "Not found"})
+
+async def webhook(headers: dict, body: str) -> int:
+    """LINE Webhook エンドポイント"""
+    # 署名検証
+    signature = headers.get('x-line-signature')
+    if not signature:
+        logger.warning("Missing X-Line-Signature header")
+        return 400
+
+    log_payload(logger, "Webhook received", body,
+                sample_rate=Config.LOG_SAMPLE_RATE, redact=Config.LOG_REDACT_BODIES)
+
+    try:
+        await handle_events(body, signature)
+    except InvalidSignatureError:
+        logger.error("Invalid signature")
+        return 400
+    except Exception as e:
+        logger.error(f"Error in webhook handler: {e}")
+        return 500
+    return 200
+
+async def lifespan(receive, send):
+    """起動・終了処理"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await shutdown_async_backends()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def read_body(receive) -> str:
+    """リクエストボディを読み込み"""
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks).decode('utf-8')
+
+async def respond(send, status: int, payload):
+    """JSON またはテキストで応答"""
+    if isinstance(payload, str):
+        body, content_type = payload.encode('utf-8'), b'text/plain; charset=utf-8'
+    else:
+        body, content_type = json.dumps(payload).encode('utf-8'), b'application/json'
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': body})
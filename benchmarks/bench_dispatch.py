@@ -0,0 +1,81 @@
+"""会話ディスパッチのマイクロベンチマーク
+
+旧 process_message の if/elif 連鎖（状態判定部分のみを再現）と、
+遷移表（conversation.resolve）による1回の参照を比較する。
+
+    python benchmarks/bench_dispatch.py [--number 200000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 外部接続しないためのダミー設定
+for key in ['LINE_CHANNEL_SECRET', 'LINE_CHANNEL_ACCESS_TOKEN', 'ANTHROPIC_API_KEY', 'OPENAI_API_KEY']:
+    os.environ.setdefault(key, 'dummy')
+os.environ.setdefault('SUPABASE_URL', 'https://dummy.supabase.co')
+
+from app.handlers.line_handler import conversation
+from app.handlers.state_machine import (
+    IDLE, RECORD_DATE, RECORD_TIME, RECORD_CLIENT, RECORD_DETAIL, RECORD_CONFIRM, HISTORY_SELECT
+)
+
+# (新状態, 旧 handle_type, 旧 number, 入力) の代表的な組み合わせ
+CASES = [
+    (IDLE, '0', 0, '記録'),
+    (RECORD_DATE, '1', 1, '2025/11/17'),
+    (RECORD_TIME, '1', 2, '14:30'),
+    (RECORD_CLIENT, '1', 3, '12'),
+    (RECORD_DETAIL, '1', 4, '初回訪問。見積もり依頼あり'),
+    (RECORD_CONFIRM, '1', 0, '1'),
+    (IDLE, '0', 0, '履歴'),
+    (HISTORY_SELECT, '2', 1, '次へ'),
+    (HISTORY_SELECT, '2', 1, '3'),
+    (IDLE, '0', 0, 'こんにちは'),
+]
+
+def legacy_dispatch(handle_type: str, number: int, message: str) -> str:
+    """旧 process_message の分岐（ハンドラー名を返す）"""
+    if '記録' in message or '履歴' in message:
+        return 'initial_command'
+    if handle_type == '2' and number == 1 and message == '次へ':
+        return 'customer_page'
+    if handle_type == '2' and number == 1:
+        return 'history_selection'
+    if handle_type == '1':
+        if number == 1:
+            return 'date_input'
+        elif number == 2:
+            return 'time_input'
+        elif number == 3:
+            return 'customer_input'
+        elif number == 4:
+            return 'detail_input'
+        elif number == 0 and message in ['1', '2', '3', '4', '5']:
+            return 'confirmation_choice'
+    return 'default'
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=200000)
+    args = parser.parse_args()
+
+    def run_legacy():
+        for _, handle_type, number, message in CASES:
+            legacy_dispatch(handle_type, number, message)
+
+    def run_table():
+        for state, _, _, message in CASES:
+            conversation.resolve(state, message)
+
+    for label, func in [("if/elif chain", run_legacy), ("transition table", run_table)]:
+        seconds = min(timeit.repeat(func, number=args.number // len(CASES), repeat=5))
+        per_call = seconds / (args.number // len(CASES) * len(CASES)) * 1e9
+        print(f"{label:<18} {per_call:8.1f} ns/dispatch")
+
+    print(f"transitions: {len(conversation.table)} entries, {len(conversation.states)} states")
+
+if __name__ == "__main__":
+    main()
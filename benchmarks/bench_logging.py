@@ -0,0 +1,99 @@
+"""リクエストあたりのログ出力オーバーヘッド計測
+
+従来の logging.basicConfig（同期出力）と setup_logging（キュー経由の非同期出力）を、
+書き込みが遅い出力先（標準出力の詰まりを模擬）で比較する。
+キュー化のみの効果とサンプリング・マスキングの効果を分けて計測し、
+キュー構成ではリクエスト処理後にキューを出力し切るまでの時間（drain）も計測する。
+
+    python benchmarks/bench_logging.py [--requests 200] [--write-delay-ms 1.0]
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.logging_config import setup_logging, stop_logging, log_payload, request_id_var, user_id_var
+
+BODY = '{"events":[{"type":"message","message":{"type":"text","text":"' + 'テスト' * 50 + '"}}]}'
+
+class SlowStream(io.TextIOBase):
+    """書き込みごとに遅延する出力先"""
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.records = 0
+
+    def write(self, s: str) -> int:
+        time.sleep(self.delay)
+        self.records += s.count('\n')
+        return len(s)
+
+def simulate_request(logger: logging.Logger, i: int, legacy: bool, sample_rate: float, redact: bool):
+    """1リクエスト分のログ出力（webhook 受信・メッセージ受信・応答送信）"""
+    request_id_var.set(f"req-{i}")
+    user_id_var.set("U0000")
+    if legacy:
+        logger.info(f"Webhook received: {BODY[:100]}...")
+        logger.info(f"Message from U0000: テスト")
+    else:
+        log_payload(logger, "Webhook received", BODY, sample_rate=sample_rate, redact=redact)
+        log_payload(logger, "Message received", "テスト", sample_rate=sample_rate, redact=redact)
+    logger.info("Response sent to U0000")
+
+def run(label: str, stream: SlowStream, requests: int, queued: bool,
+        legacy: bool = False, sample_rate: float = 1.0, redact: bool = False) -> float:
+    """リクエスト経路の時間と、キュー構成では drain 時間を計測"""
+    logger = logging.getLogger('bench')
+    stream.records = 0
+    start = time.perf_counter()
+    for i in range(requests):
+        simulate_request(logger, i, legacy, sample_rate, redact)
+    request_path = time.perf_counter() - start
+
+    drain = 0.0
+    if queued:
+        drain_start = time.perf_counter()
+        stop_logging()
+        drain = time.perf_counter() - drain_start
+
+    per_request = request_path / requests * 1000
+    print(
+        f"{label:<36} {per_request:8.3f} ms/request  "
+        f"drain {drain * 1000:8.1f} ms  "
+        f"records/request {stream.records / requests:4.2f}"
+    )
+    return per_request
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--write-delay-ms', type=float, default=1.0)
+    args = parser.parse_args()
+    stream = SlowStream(args.write_delay_ms / 1000)
+
+    # 従来構成: 同期 StreamHandler
+    root = logging.getLogger()
+    root.handlers = []
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        stream=stream
+    )
+    before = run("before (basicConfig, sync)", stream, args.requests, queued=False, legacy=True)
+
+    # キュー化のみ（全件出力・マスキングなし）
+    setup_logging('INFO', 'json', stream=stream)
+    queue_only = run("queue + json (sample=1.0, no redact)", stream, args.requests, queued=True)
+
+    # キュー化 + サンプリング・マスキング
+    setup_logging('INFO', 'json', stream=stream)
+    sampled = run("queue + json (sample=0.1, redact)", stream, args.requests, queued=True,
+                  sample_rate=0.1, redact=True)
+
+    print(f"request-path speedup: queue only {before / queue_only:.1f}x, with sampling {before / sampled:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""同期モードと ASGI（asyncio）モードの同時会話処理性能比較
+
+Postgres / Anthropic / LINE API をレイテンシ付きのローカル代替に置き換え、
+同じ会話（記録フロー + 履歴表示）を多数同時に処理したときの所要時間を比較する。
+同期モードは Procfile の gunicorn（sync ワーカー1つ、既定値）を模したスレッドプール、
+ASGI モードは単一イベントループで、DB 呼び出しは AsyncDatabase のプール上限まで同時実行する。
+
+    python benchmarks/bench_serving.py [--conversations 200] [--workers 1] [--pool-size 10] [--latency-ms 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 外部接続しないためのダミー設定
+for key in ['LINE_CHANNEL_SECRET', 'LINE_CHANNEL_ACCESS_TOKEN', 'ANTHROPIC_API_KEY', 'OPENAI_API_KEY']:
+    os.environ.setdefault(key, 'dummy')
+os.environ.setdefault('SUPABASE_URL', 'https://dummy.supabase.co')
+
+from app.services.database import AsyncDatabase
+from app.services.customer_service import customer_service
+from app.services.appointment_service import appointment_service
+from app.services.stats_service import client_stats_service
+from app.handlers.ai_handler import ai_handler
+from app.handlers.line_handler import process_message, process_message_async
+from app.utils.message_renderer import split_messages
+
+CONVERSATION = ['記録', '2025/11/17', '14:30', '顧客A', '初回訪問。見積もり依頼あり', '1', '履歴', '1']
+
+def fake_rows(query: str):
+    """クエリに応じたダミー結果"""
+    if 'FROM client_stats' in query:
+        return [{'id': 1, 'client': '顧客A', 'last_date': '2025/11/17', 'last_contact_at': datetime.now(),
+                 'appointment_count': 3, 'last_note': '初回訪問'}]
+    if 'FROM appointments' in query:
+        return [{'date': '2025/11/17', 'time': '14:30', 'client': '顧客A', 'appointment_detail': '初回訪問'}]
+    return [{'id': 1, 'client': '顧客A'}]
+
+ADVICE = SimpleNamespace(content=[SimpleNamespace(text='📊 順調です。次回は見積もりを提示しましょう。')])
+
+class SyncStandIns:
+    """同期クライアントの代替（time.sleep でレイテンシを再現）"""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.messages = self
+
+    def execute_query(self, query, params=None):
+        time.sleep(self.latency)
+        return fake_rows(query)
+
+    def execute_insert(self, query, params=None):
+        time.sleep(self.latency)
+        return {'id': 1}
+
+    def execute_transaction(self, statements):
+        time.sleep(self.latency)
+        return [None, {'id': 1}]
+
+    def create(self, **kwargs):
+        time.sleep(self.latency * 10)
+        return ADVICE
+
+    def reply(self, texts):
+        time.sleep(self.latency)
+
+class AsyncStandIns:
+    """非同期クライアントの代替（asyncio.sleep でレイテンシを再現）
+
+    DB 呼び出しは AsyncDatabase と同じくプールの接続数までしか同時実行しない。
+    """
+    def __init__(self, latency: float, pool_size: int):
+        self.latency = latency
+        self.messages = self
+        self.pool = asyncio.Semaphore(pool_size)
+
+    async def execute_query(self, query, params=None):
+        async with self.pool:
+            await asyncio.sleep(self.latency)
+        return fake_rows(query)
+
+    async def execute_insert(self, query, params=None):
+        async with self.pool:
+            await asyncio.sleep(self.latency)
+        return {'id': 1}
+
+    async def execute_transaction(self, statements):
+        async with self.pool:
+            await asyncio.sleep(self.latency)
+        return [None, {'id': 1}]
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(self.latency * 10)
+        return ADVICE
+
+    async def reply(self, texts):
+        await asyncio.sleep(self.latency)
+
+def use_stand_ins(stand_ins):
+    customer_service.db = stand_ins
+    appointment_service.db = stand_ins
+    client_stats_service.db = stand_ins
+    ai_handler.anthropic = stand_ins
+
+def bench_sync(conversations: int, workers: int, latency: float) -> float:
+    stand_ins = SyncStandIns(latency)
+    use_stand_ins(stand_ins)
+
+    def handle(user_id: str, message: str):
+        stand_ins.reply(split_messages(process_message(user_id, message)))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # 各会話のメッセージは順番に届くため、ステップごとに全会話を投入
+        for message in CONVERSATION:
+            list(pool.map(handle, [f"sync-{i}" for i in range(conversations)], [message] * conversations))
+    return time.perf_counter() - start
+
+async def bench_async(conversations: int, pool_size: int, latency: float) -> float:
+    stand_ins = AsyncStandIns(latency, pool_size)
+    use_stand_ins(stand_ins)
+
+    async def handle(user_id: str, message: str):
+        await stand_ins.reply(split_messages(await process_message_async(user_id, message)))
+
+    start = time.perf_counter()
+    for message in CONVERSATION:
+        await asyncio.gather(*(handle(f"async-{i}", message) for i in range(conversations)))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=1)  # Procfile の gunicorn 既定値
+    parser.add_argument('--pool-size', type=int, default=AsyncDatabase().max_size)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+    requests = args.conversations * len(CONVERSATION)
+
+    sync_time = bench_sync(args.conversations, args.workers, latency)
+    print(f"sync  ({args.workers} workers): {sync_time:7.2f} s  {requests / sync_time:8.1f} req/s")
+
+    async_time = asyncio.run(bench_async(args.conversations, args.pool_size, latency))
+    print(f"asgi  (1 process, pool {args.pool_size}): {async_time:7.2f} s  {requests / async_time:8.1f} req/s")
+
+    print(f"speedup: {sync_time / async_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
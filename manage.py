@@ -0,0 +1,55 @@
+import argparse
+import logging
+import sys
+from app.services.stats_service import client_stats_service
+from app.utils.aio import run_sync
+
+# ログ設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def init_db(args) -> int:
+    """集計テーブルを作成（初回は既存の商談記録から集計を構築）"""
+    count = run_sync(client_stats_service.ensure_schema())
+    print(f"集計テーブルを確認しました（初期構築: {count}件）")
+    return 0
+
+def rebuild_stats(args) -> int:
+    """顧客集計を appointments から再構築"""
+    count = run_sync(client_stats_service.rebuild(args.conversation_id))
+    print(f"再構築しました: {count}件")
+    return 0
+
+def check_stats(args) -> int:
+    """顧客集計の整合性チェック（不整合があれば終了コード1）"""
+    mismatches = run_sync(client_stats_service.check(args.conversation_id))
+    for row in mismatches:
+        print(
+            f"{row['sys_conversation_id']} / {row['client']}: {row['mismatched_fields']} "
+            f"(count expected={row['expected_count']} actual={row['actual_count']})"
+        )
+    print(f"不整合: {len(mismatches)}件")
+    return 1 if mismatches else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="LINE 顧客管理システム 管理コマンド")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('init-db', help='集計テーブルを作成・初期構築').set_defaults(func=init_db)
+
+    for name, func, help_text in [
+        ('rebuild-stats', rebuild_stats, '顧客集計を再構築'),
+        ('check-stats', check_stats, '顧客集計の整合性をチェック'),
+    ]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('--conversation-id', help='対象の会話ID（省略時は全件）')
+        sub.set_defaults(func=func)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
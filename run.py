@@ -2,13 +2,12 @@ from flask import Flask, request, abort
 from linebot.exceptions import InvalidSignatureError
 from app.config import Config
 from app.handlers.line_handler import handler
+from app.utils.logging_config import setup_logging, log_payload, request_id_var, user_id_var
 import logging
+import uuid
 
-# ログ設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# ログ設定（キュー経由の非同期出力）
+setup_logging(Config.LOG_LEVEL, Config.LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
 # 設定検証
@@ -22,6 +21,16 @@ except ValueError as e:
 # Flask アプリ初期化
 app = Flask(__name__)
 
+@app.before_request
+def assign_request_id():
+    """リクエストごとの相関IDを設定"""
+    request_id_var.set(request.headers.get('X-Request-Id') or uuid.uuid4().hex)
+
+@app.teardown_request
+def clear_request_id(exc):
+    request_id_var.set(None)
+    user_id_var.set(None)
+
 @app.route("/")
 def health_check():
     """ヘルスチェックエンドポイント"""
@@ -41,7 +50,8 @@ def webhook():
         abort(400)
     
     body = request.get_data(as_text=True)
-    logger.info(f"Webhook received: {body[:100]}...")
+    log_payload(logger, "Webhook received", body,
+                sample_rate=Config.LOG_SAMPLE_RATE, redact=Config.LOG_REDACT_BODIES)
     
     try:
         handler.handle(body, signature)
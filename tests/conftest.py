@@ -0,0 +1,9 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 外部接続しないためのダミー設定（app モジュールの import 前に設定）
+for key in ['LINE_CHANNEL_SECRET', 'LINE_CHANNEL_ACCESS_TOKEN', 'ANTHROPIC_API_KEY', 'OPENAI_API_KEY']:
+    os.environ.setdefault(key, 'dummy')
+os.environ.setdefault('SUPABASE_URL', 'https://dummy.supabase.co')
@@ -0,0 +1,281 @@
+"""会話フローのリプレイテスト
+
+サービスの DB と Anthropic クライアントをインメモリの代替に置き換え、
+記録・履歴の会話を最初から最後まで再生して、各ステップの応答と状態を検証する。
+"""
+from datetime import datetime, timedelta
+import asyncio
+from types import SimpleNamespace
+import pytest
+
+from app.config import Config
+from app.services.customer_service import customer_service
+from app.services.appointment_service import appointment_service
+from app.services.stats_service import client_stats_service, NOTE_SNIPPET_LENGTH
+from app.handlers.ai_handler import ai_handler
+from app.handlers.line_handler import process_message, process_message_async
+from app.utils.session import user_sessions
+from app.utils.aio import run_sync
+
+USER = 'U-test'
+
+class InMemoryDatabase:
+    """Database と同じインターフェースのインメモリ代替（サービスが発行するクエリのみ対応）"""
+
+    def __init__(self):
+        self.clients = []
+        self.appointments = []
+        self.stats = {}
+        self.clock = datetime(2025, 1, 1)
+        self.fail_transactions = False
+
+    def _now(self) -> datetime:
+        self.clock += timedelta(minutes=1)
+        return self.clock
+
+    def _client_id(self, client: str, conversation_id: str):
+        ids = [c['id'] for c in self.clients
+               if c['client'] == client and c['sys_conversation_id'] == conversation_id]
+        return min(ids) if ids else None
+
+    def execute_insert(self, query, params=None):
+        assert 'INSERT INTO clients' in query
+        client, user_id, conversation_id = params
+        row = {'id': len(self.clients) + 1, 'client': client,
+               'sys_user_id': user_id, 'sys_conversation_id': conversation_id}
+        self.clients.append(row)
+        return row
+
+    def execute_query(self, query, params=None):
+        if 'FROM client_stats' in query:
+            conversation_id = params[0]
+            rows = sorted(
+                (s for s in self.stats.values()
+                 if s['sys_conversation_id'] == conversation_id and s['client_id'] is not None),
+                key=lambda s: (s['last_contact_at'], s['client_id']), reverse=True
+            )
+            if '(last_contact_at, client_id) <' in query:
+                after = (params[1], params[2])
+                rows = [s for s in rows if (s['last_contact_at'], s['client_id']) < after]
+            if 'LIMIT' in query:
+                rows = rows[:params[-1]]
+            return [{**s, 'id': s['client_id']} for s in rows]
+        if 'SELECT id FROM clients' in query:
+            client, conversation_id = params
+            client_id = self._client_id(client, conversation_id)
+            return [{'id': client_id}] if client_id else []
+        if 'FROM clients' in query and 'id = %s' in query:
+            customer_id, conversation_id = params
+            return [c for c in self.clients
+                    if c['id'] == customer_id and c['sys_conversation_id'] == conversation_id]
+        if 'FROM appointments' in query:
+            conversation_id, client = params
+            return [a for a in reversed(self.appointments)
+                    if a['sys_conversation_id'] == conversation_id and a['client'] == client]
+        raise AssertionError(f"Unexpected query: {query}")
+
+    def execute_transaction(self, statements):
+        if self.fail_transactions:
+            raise RuntimeError("relation \"client_stats\" does not exist")
+        now = self._now()
+        return [self._execute_statement(query, params, now) for query, params in statements]
+
+    def _execute_statement(self, query, params, now):
+        if 'INSERT INTO clients' in query:
+            client, user_id, conversation_id, _, _ = params
+            if self._client_id(client, conversation_id) is None:
+                self.execute_insert(query, (client, user_id, conversation_id))
+            return None
+        assert 'INSERT INTO appointments' in query and 'INSERT INTO client_stats' in query, \
+            f"Unexpected statement: {query}"
+        date, time, client, detail, user_id, conversation_id = params
+        row = {'id': len(self.appointments) + 1, 'date': date, 'time': time, 'client': client,
+               'appointment_detail': detail, 'sys_user_id': user_id,
+               'sys_conversation_id': conversation_id, 'created_at': now}
+        self.appointments.append(row)
+
+        key = (conversation_id, client)
+        previous = self.stats.get(key, {'appointment_count': 0})
+        self.stats[key] = {
+            'sys_conversation_id': conversation_id,
+            'client': client,
+            'client_id': self._client_id(client, conversation_id),
+            'last_date': date,
+            'last_contact_at': row['created_at'],
+            'appointment_count': previous['appointment_count'] + 1,
+            'last_note': detail[:NOTE_SNIPPET_LENGTH],
+        }
+        return row
+
+class FakeAnthropic:
+    """Anthropic クライアントの代替（受け取ったプロンプトを記録）"""
+
+    def __init__(self):
+        self.messages = self
+        self.prompts = []
+
+    def create(self, **kwargs):
+        self.prompts.append(kwargs['messages'][0]['content'])
+        return SimpleNamespace(content=[SimpleNamespace(text='次回は見積もりを提示しましょう。')])
+
+class SlowAnthropic(FakeAnthropic):
+    """応答を release されるまで保留する非同期版（ASGI モードの Claude 待ちを再現）"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def create(self, **kwargs):
+        self.started.set()
+        await self.release.wait()
+        return super().create(**kwargs)
+
+@pytest.fixture
+def db(monkeypatch):
+    database = InMemoryDatabase()
+    for service in (customer_service, appointment_service, client_stats_service):
+        monkeypatch.setattr(service, 'db', database)
+    monkeypatch.setattr(ai_handler, 'anthropic', FakeAnthropic())
+    monkeypatch.setattr(Config, 'CUSTOMER_LIST_PAGE_SIZE', 2)
+    user_sessions.clear()
+    yield database
+    user_sessions.clear()
+
+def seed_customers(db: InMemoryDatabase, names):
+    """既存顧客と商談記録を登録"""
+    for name in names:
+        run_sync(appointment_service.create_appointment({
+            'date': '2025/10/01', 'time': '10:00', 'client': name,
+            'appointment_detail': f'{name} 初回訪問', 'sys_user_id': USER, 'sys_conversation_id': USER
+        }))
+
+def step(message: str, expected_reply: str, expected_state: str) -> str:
+    """1メッセージを処理し、応答と遷移後の状態を検証"""
+    reply = process_message(USER, message)
+    assert expected_reply in reply, f"{message!r} -> {reply!r}"
+    assert user_sessions[USER]['state'] == expected_state, f"{message!r} -> {user_sessions[USER]['state']}"
+    return reply
+
+def listed_ids(reply: str):
+    return [int(line.split(':')[0][3:]) for line in reply.splitlines() if line.startswith('ID ')]
+
+def test_record_flow_with_corrections(db):
+    seed_customers(db, ['青木工業'])
+
+    step('記録', '日付を入力', 'record_date')
+    step('2025/11/17', '時間を入力', 'record_time')
+    step('14:30', '顧客名を入力', 'record_client')
+    # コマンド語を含む顧客名・商談内容はデータとして扱う
+    step('履歴商事', '商談内容を入力', 'record_detail')
+    assert user_sessions[USER]['client'] == '履歴商事'
+    reply = step('前回の記録を確認', '以下の内容で記録します', 'record_confirm')
+    assert '👤 顧客: 履歴商事' in reply and '📝 商談内容: 前回の記録を確認' in reply
+
+    # 5: 商談内容を修正
+    step('5', '商談内容を入力', 'record_detail')
+    step('見積もり依頼あり', '以下の内容で記録します', 'record_confirm')
+
+    # 4: 顧客名を修正（存在しないID → 全角数字のID）
+    step('4', '顧客名を入力', 'record_client')
+    step('99', '該当する顧客が見つかりません', 'record_client')
+    step('１', '✅ 顧客: 青木工業', 'record_detail')
+    step('見積もり依頼あり', '👤 顧客: 青木工業', 'record_confirm')
+
+    # 3: 時間を修正（以降の項目も順に再入力）
+    step('3', '時間を入力', 'record_time')
+    step('15:00', '顧客名を入力', 'record_client')
+    step('青木工業', '商談内容を入力', 'record_detail')
+    step('見積もり依頼あり', '🕐 時間: 15:00', 'record_confirm')
+
+    # 2: 日付を修正
+    step('2', '日付を入力', 'record_date')
+    step('2025/11/18', '時間を入力', 'record_time')
+    step('15:00', '顧客名を入力', 'record_client')
+    step('青木工業', '商談内容を入力', 'record_detail')
+    step('見積もり依頼あり', '📅 日付: 2025/11/18', 'record_confirm')
+
+    # 確認画面では選択肢以外は受け付けない
+    step('はい', '「記録」または「履歴」を入力してください', 'record_confirm')
+
+    step('1', '記録しました', 'idle')
+    saved = db.appointments[-1]
+    assert (saved['date'], saved['time'], saved['client'], saved['appointment_detail']) == \
+        ('2025/11/18', '15:00', '青木工業', '見積もり依頼あり')
+    assert db.stats[(USER, '青木工業')]['appointment_count'] == 2
+    assert len(db.clients) == 1
+
+def test_record_new_customer_and_exact_command_restarts(db):
+    step('記録', '日付を入力', 'record_date')
+    step('2025/11/17', '時間を入力', 'record_time')
+    step('14:30', '顧客名を入力', 'record_client')
+    step('佐藤建設', '商談内容を入力', 'record_detail')
+    # 完全一致のコマンドは入力途中でもやり直しになる
+    step('記録', '日付を入力', 'record_date')
+    assert user_sessions[USER]['client'] == '0'
+
+    step('2025/11/17', '時間を入力', 'record_time')
+    step('14:30', '顧客名を入力', 'record_client')
+    step('佐藤建設', '商談内容を入力', 'record_detail')
+    step('x' * 100, '以下の内容で記録します', 'record_confirm')
+    step('1', '記録しました', 'idle')
+    assert [c['client'] for c in db.clients] == ['佐藤建設']
+    assert db.stats[(USER, '佐藤建設')]['last_note'] == 'x' * NOTE_SNIPPET_LENGTH
+    # 新規顧客も履歴に表示される
+    reply = step('履歴', '顧客リスト', 'history_select')
+    assert listed_ids(reply) == [1]
+
+def test_record_failure_is_reported(db):
+    db.fail_transactions = True
+    step('記録', '日付を入力', 'record_date')
+    step('2025/11/17', '時間を入力', 'record_time')
+    step('14:30', '顧客名を入力', 'record_client')
+    step('佐藤建設', '商談内容を入力', 'record_detail')
+    step('訪問', '以下の内容で記録します', 'record_confirm')
+    step('1', '記録中にエラーが発生しました', 'record_confirm')
+    assert db.appointments == [] and db.clients == []
+
+def test_history_flow_with_pagination(db):
+    seed_customers(db, ['A社', 'B社', 'C社', 'D社', 'E社'])
+
+    # 最終商談の新しい順に2件ずつ表示
+    reply = step('履歴', '顧客リスト', 'history_select')
+    assert listed_ids(reply) == [5, 4]
+    assert '「次へ」' in reply
+    reply = step('次へ', '3〜4件目を表示', 'history_select')
+    assert listed_ids(reply) == [3, 2]
+    reply = step('次へ', '5〜5件目を表示', 'history_select')
+    assert listed_ids(reply) == [1]
+    assert '「次へ」' not in reply
+    step('次へ', 'これ以上顧客はありません', 'history_select')
+
+    step('abc', '数字で入力してください', 'history_select')
+    step('99', '該当する顧客が見つかりません', 'history_select')
+    reply = step('3', '📊 C社 の営業分析', 'idle')
+    assert '次回は見積もりを提示しましょう。' in reply
+    assert 'C社 初回訪問' in ai_handler.anthropic.prompts[-1]
+
+def test_history_without_customers(db):
+    step('履歴', '顧客データがありません', 'idle')
+    step('こんにちは', '「記録」または「履歴」を入力してください', 'idle')
+
+def test_overlapping_messages_are_processed_in_order(db, monkeypatch):
+    seed_customers(db, ['A社'])
+    step('履歴', '顧客リスト', 'history_select')
+
+    async def overlap():
+        anthropic = SlowAnthropic()
+        monkeypatch.setattr(ai_handler, 'anthropic', anthropic)
+        # 顧客選択が Claude の応答を待っている間に「記録」が届く
+        selection = asyncio.create_task(process_message_async(USER, '1'))
+        await anthropic.started.wait()
+        record = asyncio.create_task(process_message_async(USER, '記録'))
+        await asyncio.sleep(0)
+        anthropic.release.set()
+        return await selection, await record
+
+    selection_reply, record_reply = asyncio.run(overlap())
+    assert '📊 A社 の営業分析' in selection_reply
+    assert '日付を入力' in record_reply
+    # 先に届いた顧客選択の reset が後の「記録」の遷移を上書きしない
+    assert user_sessions[USER]['state'] == 'record_date'
@@ -0,0 +1,40 @@
+"""キュー経由のログ出力のテスト"""
+import io
+import json
+import logging
+
+import pytest
+
+from app.utils.logging_config import setup_logging, stop_logging, request_id_var
+
+@pytest.fixture
+def restore_root():
+    root = logging.getLogger()
+    handlers, level = root.handlers, root.level
+    yield
+    stop_logging()
+    root.handlers, root.level = handlers, level
+
+def emit_exception(fmt: str) -> str:
+    stream = io.StringIO()
+    setup_logging('INFO', fmt, stream=stream)
+    token = request_id_var.set('req-1')
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logging.getLogger('test').exception("Failed: %s", 'U0000')
+    finally:
+        request_id_var.reset(token)
+    stop_logging()
+    return stream.getvalue()
+
+def test_json_keeps_traceback_as_separate_field(restore_root):
+    entry = json.loads(emit_exception('json'))
+    assert entry['message'] == 'Failed: U0000'
+    assert entry['request_id'] == 'req-1'
+    assert entry['exc_info'].startswith('Traceback') and 'ValueError: boom' in entry['exc_info']
+
+def test_text_format_still_shows_traceback(restore_root):
+    output = emit_exception('text')
+    assert '[req-1] Failed: U0000\nTraceback' in output
+    assert output.count('ValueError: boom') == 1
@@ -0,0 +1,49 @@
+"""LINE 応答メッセージ分割の境界値テスト"""
+from app.utils.message_renderer import (
+    split_messages, LINE_MAX_TEXT_LENGTH, LINE_MAX_MESSAGES_PER_REPLY, TRUNCATED_SUFFIX, EMPTY_FALLBACK
+)
+
+LIMIT = LINE_MAX_TEXT_LENGTH
+
+def assert_within_limits(chunks):
+    assert 1 <= len(chunks) <= LINE_MAX_MESSAGES_PER_REPLY
+    assert all(0 < len(chunk) <= LIMIT for chunk in chunks)
+
+def test_exactly_limit_is_single_message():
+    text = 'あ' * LIMIT
+    assert split_messages(text) == [text]
+
+def test_just_over_limit_splits_on_line_boundary():
+    text = 'a' * (LIMIT - 10) + '\n' + 'b' * 10
+    chunks = split_messages(text)
+    assert_within_limits(chunks)
+    assert chunks == ['a' * (LIMIT - 10), 'b' * 10]
+    assert '\n'.join(chunks) == text
+
+def test_single_line_longer_than_limit_is_hard_split():
+    text = 'x' * (LIMIT * 2 + 1)
+    chunks = split_messages(text)
+    assert_within_limits(chunks)
+    assert [len(chunk) for chunk in chunks] == [LIMIT, LIMIT, 1]
+    assert ''.join(chunks) == text
+
+def test_more_than_max_messages_is_truncated():
+    text = '\n'.join(str(i) * LIMIT for i in range(LINE_MAX_MESSAGES_PER_REPLY + 2))
+    chunks = split_messages(text)
+    assert_within_limits(chunks)
+    assert len(chunks) == LINE_MAX_MESSAGES_PER_REPLY
+    assert chunks[-1].endswith(TRUNCATED_SUFFIX)
+    assert chunks[:-1] == [str(i) * LIMIT for i in range(LINE_MAX_MESSAGES_PER_REPLY - 1)]
+
+def test_empty_or_whitespace_only_falls_back():
+    assert split_messages('') == [EMPTY_FALLBACK]
+    assert split_messages(' \n　\n') == [EMPTY_FALLBACK]
+    assert split_messages(['', '  ']) == [EMPTY_FALLBACK]
+
+def test_chunks_reproduce_original_when_not_truncated():
+    text = '\n'.join(f"{i:04d} " + '商談メモ' * (i % 50) for i in range(200))
+    chunks = split_messages(text)
+    assert_within_limits(chunks)
+    assert len(chunks) > 1
+    assert '\n'.join(chunks) == text
+    assert not chunks[-1].endswith(TRUNCATED_SUFFIX)